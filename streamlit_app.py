@@ -1,14 +1,28 @@
 import streamlit as st
-import json, os
-from utils.parser import extract_section0_facts
+import hashlib, json, os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+from utils.parser import extract_section0_facts, prepare_text
 from utils.pcs_builder import summarize_candidates, map_to_pcs_code
 from utils.rules_engine import load_rules, apply_rules, build_code_skeleton
 from utils.gemini_api import analyze_with_gemini
 from utils.validation import TablesContext, resolve_code
+try:
+    import orjson
+except ImportError:
+    orjson = None
 from utils.pdf_utils import extract_text_from_pdf
 
 st.set_page_config(page_title="PCS Section 0 – MVP", layout="wide")
 
+@st.cache_resource(show_spinner=False)
+def _default_api_key() -> str:
+    """GEMINI_API_KEY from st.secrets, read once per process (empty when no secrets are configured)."""
+    try:
+        return st.secrets.get('GEMINI_API_KEY', '')
+    except Exception:
+        return ""
+
 st.title("ICD-10-PCS – Section '0' (Medical & Surgical) MVP")
 st.caption("Scaffold for Section 0 only • Facts extraction + Character Builder • Plug tables later for authoritative codes")
 
@@ -17,13 +31,85 @@ with st.sidebar:
     honor_b61b = st.checkbox("Honor PCS B6.1b (suppress routine wound drains)", value=True)
 
     use_gemini = st.checkbox("Use Gemini AI for extraction", value=False, help="Requires GEMINI_API_KEY in st.secrets or below.")
-    api_key = st.text_input("GEMINI_API_KEY (optional)", type="password", value=st.secrets.get('GEMINI_API_KEY', '') if 'GEMINI_API_KEY' in st.secrets else "")
+    api_key = st.text_input("GEMINI_API_KEY (optional)", type="password", value=_default_api_key())
     st.markdown("**Section:** 0 (Medical & Surgical) — fixed for this MVP.")
     st.info("Future work: attach official tables in `assets/` and enable real mapping/validation.")
 
+def _files_sig(*paths: str) -> str:
+    """mtime signature of asset files ('-' when missing); used in cache keys so edits invalidate them."""
+    return "|".join(str(os.path.getmtime(p)) if os.path.exists(p) else "-" for p in paths)
+
 rules_path = os.path.join('assets', 'pcs_guidelines_rules_2025.json')
-RULES = load_rules(rules_path) if os.path.exists(rules_path) else None
-TABLES_CTX = TablesContext(assets_dir='assets')
+patterns_path = os.path.join('assets', 'procedure_patterns.json')
+# Signature of the rule inputs; part of every cache key so edits invalidate cached results
+rules_sig = _files_sig(rules_path, patterns_path)
+
+# Parsed once per process and shared across reruns/sessions until the file changes
+@st.cache_resource(show_spinner=False)
+def _load_rules_cached(path: str, mtime: str) -> Dict[str, Any]:
+    return load_rules(path)
+
+@st.cache_resource(show_spinner="Loading PCS tables…")
+def _load_tables_cached(assets_dir: str, sig: str) -> TablesContext:
+    return TablesContext(assets_dir=assets_dir)
+
+RULES = _load_rules_cached(rules_path, _files_sig(rules_path)) if os.path.exists(rules_path) else None
+TABLES_CTX = _load_tables_cached('assets', _files_sig(
+    os.path.join('assets', 'icd10pcs_tables_2025.xml'),
+    os.path.join('assets', 'icd10pcs_index_2025.xml'),
+    os.path.join('assets', 'body_part_key.json'),
+    os.path.join('assets', 'device_key.json'),
+    os.path.join('assets', 'device_aggregation.json'),
+))
+
+# `_t_lower` is proc_text lowercased once by the caller (prepare_text); the leading
+# underscore keeps it out of the cache key since it is derived from proc_text.
+@st.cache_data(show_spinner=False)
+def _heuristic_facts(proc_text: str, _t_lower: Optional[str] = None) -> Dict[str, Any]:
+    return extract_section0_facts(proc_text, _t_lower)
+
+@st.cache_data(show_spinner=False)
+def _analyze(proc_text: str, rules_sig: str, ai_facts: Optional[Dict[str, Any]] = None,
+             _t_lower: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Heuristic facts (merged with AI facts when given), candidate summary and rules output.
+    Pure in its arguments, so widget reruns on an unchanged note are served from cache.
+    """
+    facts = _heuristic_facts(proc_text, _t_lower)
+    if ai_facts is not None:
+        # Normalize AI keys to match downstream
+        facts.update({
+            "objective": ai_facts.get("objective"),
+            "body_parts": ai_facts.get("body_parts"),
+            "approaches": ai_facts.get("approaches"),
+            "devices": ai_facts.get("devices"),
+            "laterality": ai_facts.get("laterality"),
+            "discontinued": ai_facts.get("discontinued"),
+            "converted_to_open": ai_facts.get("converted_to_open"),
+            "multi_sites": ai_facts.get("multi_sites"),
+            "multi_objectives": ai_facts.get("multi_objectives"),
+            "biopsy": ai_facts.get("biopsy"),
+            "qualifier_hints": ai_facts.get("qualifier_hints"),
+            "device_left_in_place": ai_facts.get("device_left_in_place"),
+        })
+    return {
+        "facts": facts,
+        "summary": summarize_candidates(facts),
+        "rules_out": apply_rules(proc_text, facts, RULES, t_lower=_t_lower) if RULES else None,
+    }
+
+def _show_json(obj: Any) -> None:
+    """Render a result dict; with orjson, serialize once ourselves instead of via st.json."""
+    if orjson is not None:
+        try:
+            st.code(orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode(), language="json")
+            return
+        except TypeError:
+            pass
+    st.json(obj)
+
+def _gemini_memo_key(proc_text: str, key: Optional[str]):
+    return hashlib.sha1(proc_text.encode("utf-8")).hexdigest(), key
 
 c1, c2, c3 = st.columns(3)
 analyze = st.button("Analyze (Section 0 heuristics)")
@@ -55,43 +141,41 @@ proc_text = st.text_area("Procedure note / Operative note", value=st.session_sta
 
 analyze = st.button("Analyze (Section 0 heuristics)")
 if analyze and proc_text.strip():
-    facts = extract_section0_facts(proc_text)
-
-    # Optionally call Gemini for structured facts
+    # Optionally call Gemini for structured facts. Successful responses are memoized in the
+    # session by text hash; on a miss the (network-bound) call runs in a worker thread while
+    # the local heuristics are cached here, so latency is the max of the two rather than the sum.
+    _, t_lower = prepare_text(proc_text)
     ai_facts_resp = None
+    ai_facts = None
+    key = api_key or None
     if use_gemini:
-        key = api_key or None
-        ai_facts_resp = analyze_with_gemini(proc_text, key)
+        ai_memo = st.session_state.setdefault("_gemini_memo", {})
+        memo_key = _gemini_memo_key(proc_text, key)
+        ai_facts_resp = ai_memo.get(memo_key)
+        if ai_facts_resp is None:
+            with ThreadPoolExecutor(max_workers=1) as ex:
+                f_ai = ex.submit(analyze_with_gemini, proc_text, key)
+                _heuristic_facts(proc_text, t_lower)  # warms the cache _analyze reads below
+                ai_facts_resp = f_ai.result()
+            if ai_facts_resp.get("ok"):
+                ai_memo[memo_key] = ai_facts_resp
+    if ai_facts_resp is not None:
         if ai_facts_resp.get("ok"):
             ai_facts = ai_facts_resp.get("facts") or {}
-            # Normalize AI keys to match downstream
-            facts.update({
-                "objective": ai_facts.get("objective"),
-                "body_parts": ai_facts.get("body_parts"),
-                "approaches": ai_facts.get("approaches"),
-                "devices": ai_facts.get("devices"),
-                "laterality": ai_facts.get("laterality"),
-                "discontinued": ai_facts.get("discontinued"),
-                "converted_to_open": ai_facts.get("converted_to_open"),
-                "multi_sites": ai_facts.get("multi_sites"),
-                "multi_objectives": ai_facts.get("multi_objectives"),
-                "biopsy": ai_facts.get("biopsy"),
-                "qualifier_hints": ai_facts.get("qualifier_hints"),
-                "device_left_in_place": ai_facts.get("device_left_in_place"),
-            })
         else:
             st.warning(f"Gemini extraction failed: {ai_facts_resp.get('error')}")
 
-    summary = summarize_candidates(facts)
+    analysis = _analyze(proc_text, rules_sig, ai_facts, t_lower)
+    facts = analysis["facts"]
+    summary = analysis["summary"]
     st.subheader("2) Extracted Facts")
-    st.json({"heuristics": summary, "ai": (ai_facts_resp or {})})
+    _show_json({"heuristics": summary, "ai": (ai_facts_resp or {})})
 
     # Apply rules if available
-    rules_out = None
+    rules_out = analysis["rules_out"]
     if RULES:
-        rules_out = apply_rules(proc_text, facts, RULES)
         st.subheader("3) Rules Evaluation (from pcs_guidelines_rules_2025.json)")
-        st.json(rules_out)
+        _show_json(rules_out)
     else:
         st.info("Rules file not found in assets/.")
 
@@ -144,13 +228,14 @@ if analyze and proc_text.strip():
             qualifier_char="?"
         )
         st.success("Draft built (names only). Attach tables later to resolve actual 7 characters.")
-        st.json({"draft": result, "skeleton": skeleton})
+        _show_json({"draft": result, "skeleton": skeleton})
 
     st.markdown("### 5) Auto-Pick (Tables-driven) — Section 0")
     autopick = st.button("Auto-Pick Code from Tables")
     if autopick:
-        # Re-evaluate rules to include overrides in the final mapping
-        eff_rules = apply_rules(proc_text, facts, RULES) if RULES else None
+        # Rule overrides for the final mapping: same (proc_text, facts, RULES) as step 3,
+        # so reuse that (cached) evaluation instead of running apply_rules again
+        eff_rules = rules_out
         if not TABLES_CTX.is_ready():
             st.error("Official Tables not loaded. Place icd10pcs_tables_2025.xml in assets/.")
         else:
@@ -203,7 +288,7 @@ if analyze and proc_text.strip():
                         "root_key": c.get("root_key")
                     })
                 with st.expander("See raw resolver output"):
-                    st.json(res)
+                    _show_json(res)
             else:
                 st.warning(res.get("error") or "No candidates matched the current selections.")
 else:
@@ -1,5 +1,45 @@
 from __future__ import annotations
-from typing import Any, Dict, Optional
+import asyncio, functools, json, threading
+from typing import Any, Dict, List, Optional, Tuple
+
+MODEL_NAME = "gemini-2.0-flash"
+
+# Fixed instructions go first in every request, the note text follows. (At ~70 tokens the
+# prompt is far below the minimum prefix size for Gemini's implicit caching, so it is not cached.)
+SYSTEM_PROMPT = (
+    "You are a surgical coding extraction assistant. "
+    "Extract *only* structured JSON with the following keys: "
+    "objective, body_systems, body_parts, approaches, devices, laterality, "
+    "discontinued, converted_to_open, multi_sites, multi_objectives, biopsy, "
+    "qualifier_hints, device_left_in_place. "
+    "Use booleans for flags. Use lists where multiple values could exist. "
+    "Do NOT add commentary."
+)
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+def _run(coro):
+    """
+    Run a coroutine to completion on one long-lived background event loop.
+    Cached clients keep async connections bound to the loop that opened them,
+    so a fresh `asyncio.run` loop per call would break them.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="gemini-aio", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result()
+
+@functools.lru_cache(maxsize=4)
+def _get_client(api_key: str):
+    """google-genai Client, constructed once per API key (raises ImportError if the package is missing)."""
+    from google import genai
+    return genai.Client(api_key=api_key)
+
+def _contents(text: str) -> List[Dict[str, Any]]:
+    return [{"role": "user", "parts": [{"text": SYSTEM_PROMPT}, {"text": text}]}]
 
 def analyze_with_gemini(text: str, api_key: Optional[str]) -> Dict[str, Any]:
     """
@@ -11,33 +51,27 @@ def analyze_with_gemini(text: str, api_key: Optional[str]) -> Dict[str, Any]:
       - facts: {...}  (objective, body_parts, approaches, devices, laterality, discontinued, converted_to_open, multi_sites, biopsy, qualifier_hints)
       - error: Optional[str]
     """
+    return _run(_analyze_with_gemini_async(text, api_key))
+
+async def _analyze_with_gemini_async(text: str, api_key: Optional[str]) -> Dict[str, Any]:
+    """
+    Body of `analyze_with_gemini`, awaited on the client's aio transport. Private: it must only
+    run on `_run`'s loop, which owns the cached clients' connections.
+    """
     if not api_key:
         return {"ok": False, "facts": {}, "error": "No API key provided"}
 
     # Prefer the new google-genai client; fallback to legacy if needed.
-    client = None
     try:
-        from google import genai
-        client = genai.Client(api_key=api_key)
-        model_name = "gemini-2.0-flash"
-        system_prompt = (
-            "You are a surgical coding extraction assistant. "
-            "Extract *only* structured JSON with the following keys: "
-            "objective, body_systems, body_parts, approaches, devices, laterality, "
-            "discontinued, converted_to_open, multi_sites, multi_objectives, biopsy, "
-            "qualifier_hints, device_left_in_place. "
-            "Use booleans for flags. Use lists where multiple values could exist. "
-            "Do NOT add commentary."
-        )
-        user_text = text
-        res = client.models.generate_content(model=model_name, contents=[{"role": "user", "parts": [system_prompt + "\n\n" + user_text]}])
+        client = _get_client(api_key)
+        res = await client.aio.models.generate_content(model=MODEL_NAME, contents=_contents(text))
         raw = res.text or ""
     except Exception as e_new:
         # Legacy client fallback
         try:
             import google.generativeai as genai_legacy
             genai_legacy.configure(api_key=api_key)
-            model = genai_legacy.GenerativeModel("gemini-2.0-flash")
+            model = genai_legacy.GenerativeModel(MODEL_NAME)
             prompt = (
                 "Extract strict JSON with keys: "
                 "objective, body_systems, body_parts, approaches, devices, laterality, "
@@ -45,15 +79,47 @@ def analyze_with_gemini(text: str, api_key: Optional[str]) -> Dict[str, Any]:
                 "qualifier_hints, device_left_in_place. No commentary."
                 "\n\nTEXT:\n" + text
             )
-            res = model.generate_content(prompt)
+            res = await model.generate_content_async(prompt)
             raw = res.text or ""
         except Exception as e_legacy:
             return {"ok": False, "facts": {}, "error": f"Gemini import/call failed: {e_new} / {e_legacy}"}
 
-    # Try to locate a JSON block in the response
-    import json, re
-    m = re.search(r'\{[\s\S]*\}$', raw.strip())
-    if not m:
+    return _facts_from_raw(raw)
+
+def _find_json_span(s: str) -> Optional[Tuple[int, int]]:
+    """
+    Locate the first balanced {...} object in s with one left-to-right pass,
+    ignoring braces inside JSON strings. Returns (start, end) for s[start:end], or None.
+    """
+    start = s.find("{")
+    if start < 0:
+        return None
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(s)):
+        c = s[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                return start, i + 1
+    return None
+
+def _facts_from_raw(raw: str) -> Dict[str, Any]:
+    # Try to locate a JSON block in the response (tolerates fences/prose around it)
+    span = _find_json_span(raw)
+    if not span:
         # Best effort: sometimes the model returns JSON already.
         try:
             facts = json.loads(raw)
@@ -62,7 +128,63 @@ def analyze_with_gemini(text: str, api_key: Optional[str]) -> Dict[str, Any]:
             return {"ok": False, "facts": {}, "error": "Gemini did not return JSON"}
 
     try:
-        facts = json.loads(m.group(0))
+        facts = json.loads(raw[span[0]:span[1]])
         return {"ok": True, "facts": facts, "error": None}
     except Exception as e:
         return {"ok": False, "facts": {}, "error": f"JSON parse error: {e}"}
+
+# ---------- Batch mode (non-interactive bulk runs) ----------
+
+def submit_gemini_batch(texts: List[str], api_key: str, jsonl_path: str) -> Dict[str, Any]:
+    """
+    Writes one extraction request per note to `jsonl_path` (keys 'note-0', 'note-1', ...)
+    and submits it through the Gemini Batch API, which is billed at about half the
+    interactive rate. Returns {"ok", "job", "error"}; poll with `collect_gemini_batch`.
+    """
+    try:
+        client = _get_client(api_key)
+        with open(jsonl_path, "w", encoding="utf-8") as f:
+            for i, text in enumerate(texts):
+                f.write(json.dumps({"key": f"note-{i}", "request": {"contents": _contents(text)}}) + "\n")
+        uploaded = client.files.upload(file=jsonl_path, config={"mime_type": "jsonl"})
+        job = client.batches.create(model=MODEL_NAME, src=uploaded.name)
+        return {"ok": True, "job": job.name, "error": None}
+    except Exception as e:
+        return {"ok": False, "job": None, "error": f"Gemini batch submit failed: {e}"}
+
+def collect_gemini_batch(job_name: str, api_key: str) -> Dict[str, Any]:
+    """
+    Returns {"ok", "state", "results", "error"} where `results` maps each request key
+    to the same dict `analyze_with_gemini` returns (a failed request carries the batch
+    error; an unreadable output line is listed as 'line-<n>'). `ok` is False until the
+    job has succeeded.
+    """
+    try:
+        client = _get_client(api_key)
+        job = client.batches.get(name=job_name)
+        state = job.state.name if job.state else None
+        if state != "JOB_STATE_SUCCEEDED":
+            return {"ok": False, "state": state, "results": {}, "error": None}
+        content = client.files.download(file=job.dest.file_name).decode("utf-8")
+    except Exception as e:
+        return {"ok": False, "state": None, "results": {}, "error": f"Gemini batch fetch failed: {e}"}
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for n, line in enumerate(content.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            rec = json.loads(line)
+            if not isinstance(rec, dict):
+                raise ValueError("not a JSON object")
+        except ValueError as e:
+            # Truncated/garbled output line: its key is unknown, so record it by line number
+            results[f"line-{n}"] = {"ok": False, "facts": {}, "error": f"Unreadable batch output line: {e}"}
+            continue
+        if rec.get("error"):
+            results[rec.get("key")] = {"ok": False, "facts": {}, "error": f"Gemini batch request failed: {rec['error']}"}
+            continue
+        cands = (rec.get("response") or {}).get("candidates") or [{}]
+        parts = (cands[0].get("content") or {}).get("parts") or []
+        results[rec.get("key")] = _facts_from_raw("".join(p.get("text", "") for p in parts))
+    return {"ok": True, "state": state, "results": results, "error": None}
@@ -0,0 +1,13 @@
+from __future__ import annotations
+from typing import Any
+import json
+
+try:
+    import orjson  # SIMD JSON parser; stdlib json is used when it isn't installed
+except ImportError:
+    orjson = None
+
+def read_json(path: str) -> Any:
+    with open(path, "rb") as f:
+        data = f.read()
+    return orjson.loads(data) if orjson is not None else json.loads(data)
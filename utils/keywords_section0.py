@@ -55,3 +55,15 @@ DEVICE_HINTS: List[Tuple[str, List[str]]] = [
     ("Synthetic Substitute", ["mesh", "graft", "patch"]),
     ("Intraluminal Device", ["prosthesis", "valve", "pacemaker", "lead"]),
 ]
+
+# Plain word flags surfaced in facts["raw_text_flags"]
+TEXT_FLAGS: List[str] = ["biopsy", "excisional", "laparoscopic", "open", "percutaneous", "thoracoscopic", "endoscopic"]
+
+# Keyword buckets scanned together by utils.parser (one pass per note), in hint-id order
+KEYWORD_BUCKETS: List[Tuple[str, Dict[str, List[str]]]] = [
+    ("root_operation", ROOT_OPERATION_HINTS),
+    ("body_system", BODY_SYSTEM_HINTS),
+    ("approach", APPROACH_HINTS),
+    ("device", dict(DEVICE_HINTS)),
+    ("flag", {f: [f] for f in TEXT_FLAGS}),
+]
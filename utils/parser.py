@@ -1,16 +1,107 @@
 from __future__ import annotations
-import re
-from typing import Dict, Any, List, Tuple
-from .keywords_section0 import ROOT_OPERATION_HINTS, BODY_SYSTEM_HINTS, APPROACH_HINTS, DEVICE_HINTS
+import heapq, re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, FrozenSet, Iterator, List, Optional, Set, Tuple
+from . import keywords_section0 as kw
 
-def _norm(text: str) -> str:
-    return (text or "").lower()
+try:
+    import ahocorasick  # one-pass keyword scan; a fused regex otherwise
+except ImportError:
+    ahocorasick = None
 
-def _score_hits(text: str, keywords: List[str]) -> int:
-    return sum(1 for k in keywords if re.search(r"\b" + re.escape(k) + r"\b", text))
+# Domain patterns are fixed; compile once (case-insensitive, so the note is never lowercased)
+_UNICONDYLAR_RX = re.compile(r"\bunicondyl|\bunicomp|\buka\b", re.IGNORECASE)
+_CEMENTED_RX = re.compile(r"\bcement(ed)?\b|\bpmma\b", re.IGNORECASE)
+_DRAIN_RX = re.compile(r"hemovac|\bjp drain\b|drain left in place", re.IGNORECASE)
+_FASCIA_RX = re.compile(r"down to fascia|into fascia", re.IGNORECASE)
 
-def extract_section0_facts(raw_text: str) -> Dict[str, Any]:
-    t = _norm(raw_text)
+# ---------- Fused keyword scanner ----------
+# Every keyword of every bucket goes into one matcher so a note is scanned once.
+# Hints get integer ids; each bucket owns a contiguous id range (_BUCKET_SLICES),
+# so per-hint scores live in one flat list.
+_BUCKET_SLICES: Dict[str, slice] = {}
+_HINT_NAMES: List[str] = []                      # hint id -> hint name
+_KEYWORD_HINT_IDS: Dict[str, Tuple[int, ...]] = {}  # distinct lowercase keyword -> hint ids listing it
+for _bucket, _hints in kw.KEYWORD_BUCKETS:
+    _first = len(_HINT_NAMES)
+    for _name, _kws in _hints.items():
+        for _kw in _kws:
+            _kw = _kw.lower()
+            _KEYWORD_HINT_IDS[_kw] = _KEYWORD_HINT_IDS.get(_kw, ()) + (len(_HINT_NAMES),)
+        _HINT_NAMES.append(_name)
+    _BUCKET_SLICES[_bucket] = slice(_first, len(_HINT_NAMES))
+
+def _build_regex_matcher() -> Tuple[re.Pattern, Dict[str, FrozenSet[str]]]:
+    """
+    Regex fallback: matching inside a lookahead lets overlapping keywords ("jp drain" / "drain")
+    each register a hit; the covers map credits shorter keywords sharing a start ("lymph" in "lymph node").
+    """
+    escaped = {k: re.escape(k) for k in _KEYWORD_HINT_IDS}
+    rx = re.compile(
+        r"(?=\b(" + "|".join(escaped[k] for k in sorted(escaped, key=len, reverse=True)) + r")\b)",
+        re.IGNORECASE)
+    prefix_rx = {k: re.compile(r"\b" + e + r"\b") for k, e in escaped.items()}
+    covers = {k: frozenset(p for p in escaped if k.startswith(p) and prefix_rx[p].match(k)) for k in escaped}
+    return rx, covers
+
+_KEYWORD_RX, _KEYWORD_COVERS = _build_regex_matcher()
+
+# Aho-Corasick automaton; reports every keyword ending at each position. Values are (size, keyword).
+_KEYWORD_AUTOMATON = None
+if ahocorasick is not None:
+    _KEYWORD_AUTOMATON = ahocorasick.Automaton()
+    for _kw in _KEYWORD_HINT_IDS:
+        _KEYWORD_AUTOMATON.add_word(_kw, (len(_kw), _kw))
+    _KEYWORD_AUTOMATON.make_automaton()
+
+def _is_word(c: str) -> bool:
+    return c.isalnum() or c == "_"
+
+def iter_word_hits(automaton, t: str) -> Iterator[Any]:
+    """
+    Payloads of the phrases an Aho-Corasick automaton finds in t as whole words/phrases.
+    Values must be (phrase length, payload); phrases start and end with a word character,
+    so the boundary test mirrors regex \\b...\\b.
+    """
+    n = len(t)
+    for end, (size, payload) in automaton.iter(t):
+        start = end - size + 1
+        if (start == 0 or not _is_word(t[start - 1])) and (end + 1 == n or not _is_word(t[end + 1])):
+            yield payload
+
+def prepare_text(s: Optional[str]) -> Tuple[str, str]:
+    """(raw, lowercased) note text; lowercase once and pass it to the parser and rules engine."""
+    if not s:
+        return "", ""
+    return s, s.lower()
+
+def _keyword_hits(text: str, t_lower: Optional[str] = None) -> Set[str]:
+    """Distinct keywords (lowercase) found in text on word boundaries, in a single pass."""
+    hits: Set[str] = set()
+    if _KEYWORD_AUTOMATON is not None:
+        hits.update(iter_word_hits(_KEYWORD_AUTOMATON, t_lower if t_lower is not None else text.lower()))
+    else:
+        for m in _KEYWORD_RX.findall(text):
+            hits |= _KEYWORD_COVERS[m.lower()]
+    return hits
+
+def _hint_scores(text: str, t_lower: Optional[str] = None) -> List[int]:
+    """Per-hint-id score: number of distinct keywords of that hint found in text."""
+    counts = [0] * len(_HINT_NAMES)
+    for k in _keyword_hits(text, t_lower):
+        for h in _KEYWORD_HINT_IDS[k]:
+            counts[h] += 1
+    return counts
+
+def _ranked(counts: List[int], bucket: str, k: int = 5) -> List[Tuple[str, int]]:
+    """Top-k (name, score) of one bucket by score, ties in hint order (same as a stable sort)."""
+    sl = _BUCKET_SLICES[bucket]
+    top = heapq.nlargest(k, (h for h in range(sl.start, sl.stop) if counts[h]), key=counts.__getitem__)
+    return [(_HINT_NAMES[h], counts[h]) for h in top]
+
+def extract_section0_facts(raw_text: str, t_lower: Optional[str] = None) -> Dict[str, Any]:
+    """`t_lower` may carry raw_text already lowercased (see `prepare_text`) to skip another copy."""
+    t = raw_text or ""
     facts: Dict[str, Any] = {
         "root_operation_candidates": [],
         "body_system_candidates": [],
@@ -19,59 +110,42 @@ def extract_section0_facts(raw_text: str) -> Dict[str, Any]:
         "raw_text_flags": []
     }
 
-    # Root operations
-    ro_scores = []
-    for name, kws in ROOT_OPERATION_HINTS.items():
-        score = _score_hits(t, kws)
-        if score:
-            ro_scores.append((name, score))
-    ro_scores.sort(key=lambda x: x[1], reverse=True)
-    facts["root_operation_candidates"] = ro_scores[:5]
-
-    # Body system
-    bs_scores = []
-    for name, kws in BODY_SYSTEM_HINTS.items():
-        score = _score_hits(t, kws)
-        if score:
-            bs_scores.append((name, score))
-    bs_scores.sort(key=lambda x: x[1], reverse=True)
-    facts["body_system_candidates"] = bs_scores[:5]
-
-    # Approach
-    ap_scores = []
-    for name, kws in APPROACH_HINTS.items():
-        score = _score_hits(t, kws)
-        if score:
-            ap_scores.append((name, score))
-    ap_scores.sort(key=lambda x: x[1], reverse=True)
-    facts["approach_candidates"] = ap_scores[:5]
-
-    # Device
-    device_hits = []
-    for name, kws in DEVICE_HINTS:
-        score = _score_hits(t, kws)
-        if score:
-            device_hits.append((name, score))
-    device_hits.sort(key=lambda x: x[1], reverse=True)
-    facts["device_hints"] = device_hits[:5]
+    # One scan over the note, scored per hint id
+    counts = _hint_scores(t, t_lower)
+    facts["root_operation_candidates"] = _ranked(counts, "root_operation")
+    facts["body_system_candidates"] = _ranked(counts, "body_system")
+    facts["approach_candidates"] = _ranked(counts, "approach")
+    facts["device_hints"] = _ranked(counts, "device")
 
     # Simple flags
-    for flag in ["biopsy", "excisional", "laparoscopic", "open", "percutaneous", "thoracoscopic", "endoscopic"]:
-        if re.search(r"\b" + flag + r"\b", t):
-            facts["raw_text_flags"].append(flag)
-
+    sl = _BUCKET_SLICES["flag"]
+    facts["raw_text_flags"] = [_HINT_NAMES[h] for h in range(sl.start, sl.stop) if counts[h]]
 
     # Additional domain flags from recent notes
-    if re.search(r"\bunicondyl|\bunicomp|\buka\b", t):
+    if _UNICONDYLAR_RX.search(t):
         facts.setdefault("qualifier_hints", []).append("Unicondylar")
         facts["raw_text_flags"].append("unicondylar")
-    if re.search(r"\bcement(ed)?\b|\bpmma\b", t):
+    if _CEMENTED_RX.search(t):
         facts.setdefault("device_hints", []).append(("Synthetic Substitute, Cemented", 1))
         facts["raw_text_flags"].append("cemented")
-    if re.search(r"hemovac|\bjp drain\b|drain left in place", t):
+    if _DRAIN_RX.search(t):
         facts.setdefault("device_hints", []).append(("Drainage Device", 1))
         facts["raw_text_flags"].append("drain_placed")
-    if re.search(r"down to fascia|into fascia", t):
+    if _FASCIA_RX.search(t):
         facts.setdefault("body_system_candidates", []).insert(0, ("Subcutaneous Tissue and Fascia", 5))
 
     return facts
+
+# Below this many notes a process pool costs more to start than it saves
+_BATCH_MIN_PARALLEL = 256
+
+def extract_section0_facts_batch(texts: List[str], workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    `extract_section0_facts` over many notes, results in input order.
+    Matching is CPU-bound and holds the GIL (neither `re` nor the automaton iterator
+    releases it), so large batches are spread over worker processes; small ones run inline.
+    """
+    if workers == 1 or len(texts) < _BATCH_MIN_PARALLEL:
+        return [extract_section0_facts(t) for t in texts]
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(extract_section0_facts, texts, chunksize=32))
@@ -1,33 +1,69 @@
 from __future__ import annotations
-from typing import Any, Dict, List, Tuple
-import json, os, re
+from typing import Any, Dict, List, Optional, Tuple
+import functools, os, re
+from .json_io import read_json
+from .parser import iter_word_hits
 
 def load_rules(path: str) -> Dict[str, Any]:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def detect_flags(raw_text: str) -> Dict[str, bool]:
-    t = (raw_text or "").lower()
-    def has(*words):
-        return any(re.search(r"" + re.escape(w.lower()) + r"", t) for w in words)
-    return {
-        "biopsy": has("biopsy"),
-        "aborted": has("aborted", "abandon", "terminated"),
-        "discontinued": has("discontinued", "aborted"),
-        "converted_to_open": has("converted to open", "conversion to open"),
-        "drain_placed": has("drain placed", "jp drain", "drain left in place", "chest tube", "hemovac"),
-        "no_device_left": has("removed at end", "no device left"),
-        "hemostasis": has("hemostasis", "control of bleeding", "control hemorrhage"),
-        "bilateral": has("bilateral", "both sides"),
-        "embolization": has("embolization", "occlude", "narrow"),
-        "unicondylar": has("unicondylar", "unicompartmental", "uka"),
-        "cemented": has("cement", "cemented", "pmma"),
-        "down_to_fascia": has("down to fascia", "into fascia")
-    }
+    return read_json(path)
+
+try:
+    import ahocorasick  # one-pass multi-phrase scan; plain substring checks otherwise
+except ImportError:
+    ahocorasick = None
+
+# Flag -> phrases, matched as whole words/phrases in the lowercased note
+# (so inflected forms are listed explicitly; whole words keep "cement" out of "placement")
+FLAG_PHRASES: Dict[str, Tuple[str, ...]] = {
+    "biopsy": ("biopsy",),
+    "aborted": ("aborted", "abandon", "abandoned", "terminated"),
+    "discontinued": ("discontinued", "aborted"),
+    "converted_to_open": ("converted to open", "conversion to open"),
+    "drain_placed": ("drain placed", "jp drain", "drain left in place", "chest tube", "hemovac"),
+    "no_device_left": ("removed at end", "no device left"),
+    "hemostasis": ("hemostasis", "control of bleeding", "control hemorrhage"),
+    "bilateral": ("bilateral", "bilaterally", "both sides"),
+    "embolization": ("embolization", "occlude", "occluded", "occlusion", "narrow", "narrowed", "narrowing"),
+    "unicondylar": ("unicondylar", "unicompartmental", "uka"),
+    "cemented": ("cement", "cemented", "pmma"),
+    "down_to_fascia": ("down to fascia", "into fascia"),
+}
+
+# Fallback: one alternation per flag, compiled once
+_FLAG_RX: Dict[str, re.Pattern] = {
+    flag: re.compile(r"\b(?:" + "|".join(re.escape(w) for w in words) + r")\b")
+    for flag, words in FLAG_PHRASES.items()
+}
+
+_FLAG_AUTOMATON = None
+if ahocorasick is not None:
+    _phrase_flags: Dict[str, List[str]] = {}
+    for _flag, _phrases in FLAG_PHRASES.items():
+        for _ph in _phrases:
+            _phrase_flags.setdefault(_ph, []).append(_flag)
+    _FLAG_AUTOMATON = ahocorasick.Automaton()
+    for _ph, _flags in _phrase_flags.items():
+        _FLAG_AUTOMATON.add_word(_ph, (len(_ph), tuple(_flags)))
+    _FLAG_AUTOMATON.make_automaton()
+
+def detect_flags(raw_text: str, t_lower: Optional[str] = None) -> Dict[str, bool]:
+    if t_lower is not None:
+        t = t_lower
+    else:
+        t = raw_text.lower() if raw_text else ""
+    if _FLAG_AUTOMATON is None:
+        return {flag: bool(rx.search(t)) for flag, rx in _FLAG_RX.items()}
+    # Single pass over the note
+    hit = set()
+    for flags in iter_word_hits(_FLAG_AUTOMATON, t):
+        hit.update(flags)
+    return {flag: flag in hit for flag in FLAG_PHRASES}
 
 
-def apply_rules(raw_text: str, facts: Dict[str, Any], rules: Dict[str, Any]) -> Dict[str, Any]:
-    flags = detect_flags(raw_text)
+def apply_rules(raw_text: str, facts: Dict[str, Any], rules: Dict[str, Any],
+                t_lower: Optional[str] = None) -> Dict[str, Any]:
+    """`t_lower` may carry raw_text already lowercased (only flag detection needs it)."""
+    flags = detect_flags(raw_text, t_lower)
     # Start with pass-through
     result: Dict[str, Any] = {
         "updates": {},
@@ -36,8 +72,8 @@ def apply_rules(raw_text: str, facts: Dict[str, Any], rules: Dict[str, Any]) ->
     }
     # Procedure patterns
     patterns_path = os.path.join("assets", "procedure_patterns.json")
-    ptns = _load_patterns(patterns_path)
-    p_updates = _apply_procedure_patterns(raw_text, ptns)
+    ptns = _compiled_patterns(patterns_path)
+    p_updates = _apply_procedure_patterns(raw_text or "", ptns)
     for k,v in p_updates.items():
         if k == "notes":
             continue
@@ -51,9 +87,8 @@ def apply_rules(raw_text: str, facts: Dict[str, Any], rules: Dict[str, Any]) ->
     if p_updates.get("outside_section_matches"):
         result["notes"].append("Outside Section 0 detected: " + "; ".join(p_updates["outside_section_matches"]))
     # PCS B6.1b – routine post-op wound drains are integral to the primary procedure
-    t = (raw_text or "").lower()
     try:
-        distinct = _distinct_drainage_procedure(t)
+        distinct = _distinct_drainage_procedure(raw_text or "")
     except Exception:
         distinct = False
     if flags.get("drain_placed") and not distinct:
@@ -114,76 +149,121 @@ def build_code_skeleton(section_char: str = "0",
     return f"{section_char}{body_system_char}{root_operation_char}{body_part_char}{approach_char}{device_char}{qualifier_char}"
 
 
-import json, os, re
-
 def _load_patterns(path: str):
     if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return read_json(path)
     return {"procedures": []}
 
-def _apply_procedure_patterns(raw_text: str, patterns: dict) -> dict:
-    t = (raw_text or "").lower()
-    updates = {"notes": []}
-    matches = []
+# Backreferences / conditionals point at group numbers/names, which shift once triggers are fused
+_GROUP_REF_RX = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+
+def _compile_if(cond: str) -> Optional[re.Pattern]:
+    try:
+        return re.compile(cond, re.IGNORECASE)
+    except re.error:
+        return None
+
+def _if_matches(hint: dict, t: str) -> bool:
+    rx = hint["_if_rx"]
+    return rx is not None and rx.search(t) is not None
+
+def _compile_patterns(patterns: dict) -> dict:
+    """
+    Attach compiled regexes to the patterns structure in place: each procedure gets
+    `_triggers`, a tuple of compiled triggers (normally all fused into one alternation;
+    compiled one by one when fusing would fail or change their meaning), and every dict
+    hint gets `_if_rx` (None when the condition is not a valid regex; it then never
+    matches). Invalid triggers are skipped, as before.
+    """
     for p in (patterns.get("procedures") or []):
+        valid = []
         for rx in p.get("triggers", []):
             try:
-                if re.search(rx, t):
-                    matches.append(p)
-                    break
+                valid.append(re.compile(rx, re.IGNORECASE))
             except re.error:
                 continue
+        triggers = tuple(valid)
+        if len(valid) > 1 and not any(_GROUP_REF_RX.search(rx.pattern) for rx in valid):
+            try:
+                # e.g. a leading (?i) or a group name reused across triggers can't be fused
+                triggers = (re.compile("|".join(f"(?:{rx.pattern})" for rx in valid), re.IGNORECASE),)
+            except re.error:
+                pass
+        p["_triggers"] = triggers
+        for key in ("qualifier_hints", "body_system_hints", "device_hints"):
+            for h in p.get(key, []) or []:
+                if isinstance(h, dict):
+                    h["_if_rx"] = _compile_if(h.get("if", "."))
+    return patterns
+
+@functools.lru_cache(maxsize=4)
+def _compiled_patterns_for(path: str, mtime: float) -> dict:
+    return _compile_patterns(_load_patterns(path))
+
+def _compiled_patterns(path: str) -> dict:
+    """Loaded + compiled patterns, reused until the file changes on disk."""
+    mtime = os.path.getmtime(path) if os.path.exists(path) else 0.0
+    return _compiled_patterns_for(path, mtime)
+
+def _append_unique(acc: List[Any], values) -> None:
+    """Append truthy values not already in acc; keeps first-seen order for 'first hit wins' consumers."""
+    for v in values:
+        if v and v not in acc:
+            acc.append(v)
+
+def _apply_procedure_patterns(t: str, patterns: dict) -> dict:
+    """
+    `t` is the note in any case (all pattern regexes are compiled case-insensitive);
+    `patterns` must have been through `_compile_patterns`.
+    """
+    updates = {"notes": []}
+    matches = [p for p in (patterns.get("procedures") or [])
+               if any(rx.search(t) for rx in p["_triggers"])]
     if not matches:
         return updates
 
     # Merge matched hints
     for p in matches:
         if p.get("root_operation_hint"):
-            updates.setdefault("root_operation_hint", set()).add(p["root_operation_hint"])
+            _append_unique(updates.setdefault("root_operation_hint", []), [p["root_operation_hint"]])
         # Handle qualifiers
         for q in p.get("qualifier_hints", []) or []:
             if isinstance(q, dict):
-                if re.search(q.get("if", "."), t):
-                    updates.setdefault("qualifier_hints", set()).add(q.get("qualifier"))
+                if _if_matches(q, t):
+                    _append_unique(updates.setdefault("qualifier_hints", []), [q.get("qualifier")])
             else:
-                updates.setdefault("qualifier_hints", set()).add(q)
+                _append_unique(updates.setdefault("qualifier_hints", []), [q])
         # Body system/approach
         for bh in p.get("body_system_hints", []) or []:
-            cond = bh.get("if", ".")
-            if re.search(cond, t):
-                updates.setdefault("body_system_bias", set()).update( (bh.get("body_system") or "").split("|") )
+            if _if_matches(bh, t):
+                _append_unique(updates.setdefault("body_system_bias", []), (bh.get("body_system") or "").split("|"))
                 if bh.get("approach"):
                     updates["approach_override"] = bh["approach"]
         # Devices
         for dh in p.get("device_hints", []) or []:
-            if re.search(dh.get("if", "."), t):
+            if _if_matches(dh, t):
                 updates["device_override"] = dh.get("device")
         # Multi-code recipe
         if p.get("multi_code_recipe"):
-            updates.setdefault("multi_code_recipe", set()).update(p["multi_code_recipe"])
+            _append_unique(updates.setdefault("multi_code_recipe", []), p["multi_code_recipe"])
         # Outside section marker
         if p.get("section") and p["section"] != "0":
-            updates.setdefault("outside_section_matches", set()).add(f"{p['name']} -> Section {p['section']}")
-    # Normalize sets to lists
-    for k,v in list(updates.items()):
-        if isinstance(v, set):
-            updates[k] = sorted([x for x in v if x])
-
+            _append_unique(updates.setdefault("outside_section_matches", []), [f"{p['name']} -> Section {p['section']}"])
     return updates
 
 
+# Separate (non-wound) drainage procedures: IR/image-guided catheters, thoracostomy, ostomies, taps
+_DISTINCT_DRAIN_RX = re.compile(
+    r"\bir\b|interventional radiology|ct[-\s]?guided|ultrasound[-\s]?guided"
+    r"|tube thoracostomy|\bthoracostomy\b|pigtail|nephrostomy"
+    r"|cholecystostomy|percutaneous drain|image[-\s]?guided drain|guided catheter"
+    r"|paracentesis|thoracentesis",
+    re.IGNORECASE)
+
 def _distinct_drainage_procedure(t: str) -> bool:
     '''
     Return True when the note documents a separate drainage procedure
     (e.g., tube thoracostomy, IR abscess catheter, nephrostomy), not a routine wound drain.
+    `t` may be in any case; the trigger regex is case-insensitive.
     '''
-    t = (t or "").lower()
-    triggers = [
-        r"\bir\b", r"interventional radiology", r"ct[-\s]?guided", r"ultrasound[-\s]?guided",
-        r"tube thoracostomy", r"\bthoracostomy\b", r"pigtail", r"nephrostomy",
-        r"cholecystostomy", r"percutaneous drain", r"image[-\s]?guided drain", r"guided catheter",
-        r"paracentesis", r"thoracentesis"
-    ]
-    return any(re.search(rx, t) for rx in triggers)
-
+    return bool(_DISTINCT_DRAIN_RX.search(t))
@@ -1,17 +1,145 @@
 
 from __future__ import annotations
-from typing import Any, Dict, List, Optional, Tuple
-import os, re, xml.etree.ElementTree as ET
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import functools, glob, mmap, os, pickle, re
+from concurrent.futures import ProcessPoolExecutor
+from .json_io import read_json
+
+try:
+    from lxml import etree as ET  # libxml2 builds the tree in C; same API subset as below
+    _LXML = True
+except ImportError:
+    import xml.etree.ElementTree as ET
+    _LXML = False
+
+try:
+    import ahocorasick  # one-pass scan for index titles; plain substring checks otherwise
+except ImportError:
+    ahocorasick = None
 
 # ---------- Helpers ----------
+def _iter_elements(path: str, tag: str):
+    """
+    Yield each complete <tag> element of the XML file, then clear and detach it, so the
+    document is never held in memory whole. lxml filters on the tag in C and only hands
+    those elements back; stdlib ET reports every element and is filtered here.
+    """
+    if _LXML:
+        for _, elem in ET.iterparse(path, events=("end",), tag=tag, huge_tree=True, collect_ids=False):
+            yield elem
+            elem.clear()
+            # lxml keeps cleared siblings attached; drop the ones already consumed
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+        return
+    root = None
+    for event, elem in ET.iterparse(path, events=("start", "end")):
+        if root is None:
+            root = elem
+        if event == "end" and elem.tag == tag:
+            yield elem
+            elem.clear()
+            root.clear()
+
+# Below this size a tables file streams faster than a process pool can start and ship results back
+_PARALLEL_MIN_BYTES = 32 << 20
+_TABLE_START_RX = re.compile(rb"<pcsTable[\s>]")
+_TABLE_END = b"</pcsTable>"
+
+def _parse_table_chunk(data: bytes) -> Dict[str, Dict[str, Any]]:
+    """Process-pool worker: `PCSTables.tables` for one run of <pcsTable> elements under a synthetic root."""
+    if _LXML:
+        root = ET.fromstring(data, ET.XMLParser(huge_tree=True, collect_ids=False))
+    else:
+        root = ET.fromstring(data)
+    part = PCSTables()
+    for pt in root.iterfind('pcsTable'):
+        part._add_table(pt)
+    return part.tables
+
 def _norm(s: Optional[str]) -> str:
     return (s or "").strip()
 
-def _eq(a: str, b: str) -> bool:
-    return _norm(a).lower() == _norm(b).lower()
+def _match_key(name: Optional[str]) -> Optional[str]:
+    """Stripped+lowercased name as compared against label text_lc; None when not given."""
+    return _norm(name).lower() if name else None
+
+# Parsed tables/index are pickled under <assets>/.cache, keyed by the XML's mtime+size.
+# Bump when the pickled structures change shape.
+_CACHE_VERSION = 2
+
+def _cache_path(src_path: str) -> str:
+    st = os.stat(src_path)
+    name = os.path.splitext(os.path.basename(src_path))[0]
+    return os.path.join(os.path.dirname(src_path), ".cache",
+                        f"{name}-v{_CACHE_VERSION}-{st.st_mtime_ns}-{st.st_size}.pkl")
 
-def _contains(a: str, b: str) -> bool:
-    return _norm(b).lower() in _norm(a).lower()
+def _load_cached(src_path: str, build):
+    """`build(src_path)`, reused from the pickle cache while the source file is unchanged."""
+    path = _cache_path(src_path)
+    if os.path.exists(path):
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except Exception:
+            pass  # truncated/incompatible cache: parse again and overwrite it
+    obj = build(src_path)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(obj, f, protocol=5)
+        os.replace(tmp, path)
+        # Drop pickles of older versions of the same file
+        prefix = os.path.splitext(os.path.basename(src_path))[0] + "-"
+        for old in glob.glob(os.path.join(os.path.dirname(path), glob.escape(prefix) + "*.pkl")):
+            if old != path:
+                os.remove(old)
+    except OSError:
+        pass  # read-only assets dir: parse on every start
+    return obj
+
+# Axis label as parsed: (code, text, text lowercased for matching)
+Label = Tuple[str, str, str]
+
+# Flyweight: identical (code, text) labels ('Z'/'No Device', approach lists, ...) repeat across
+# thousands of rows; share one read-only tuple per distinct label
+_LABEL_INTERN: Dict[Tuple[str, str], Label] = {}
+
+# pcsRow axis pos -> index in the stored row tuple
+_ROW_AXES = {'4': 0, '5': 1, '6': 2, '7': 3}
+
+def _label_dict(lab: Optional[Label]) -> Optional[Dict[str, str]]:
+    return {"code": lab[0], "text": lab[1]} if lab else None
+
+def _pick_option(options: Sequence[Label], want_lc: Optional[str]) -> Tuple[Optional[Label], int]:
+    """
+    Pick one label of an axis: exact text match scores 3, substring match 2.
+    `want_lc` is the wanted name stripped+lowercased, None when not given.
+    """
+    if not options:
+        return None, 0
+    if want_lc is None:
+        # Default preference: if there is 'No Device' or 'No Qualifier', prefer that by convention
+        # (one pass; 'No Device' wins over an earlier 'No Qualifier')
+        no_qual = None
+        for o in options:
+            if o[2] == 'no device':
+                return o, 1
+            if no_qual is None and o[2] == 'no qualifier':
+                no_qual = o
+        if no_qual is not None:
+            return no_qual, 1
+        return options[0], 0
+    # exact match
+    for o in options:
+        if o[2] == want_lc:
+            return o, 3
+    # substring match
+    for o in options:
+        if want_lc in o[2] or o[2] in want_lc:
+            return o, 2
+    return options[0], 0
 
 # ---------- Tables Parser ----------
 
@@ -21,88 +149,167 @@ class PCSTables:
       - header for axis 1..3 (Section, Body System, Operation) with code+text
       - all pcsRows with axis 4..7 (Body Part, Approach, Device, Qualifier) labels (code+text)
     """
-    def __init__(self, root: ET.Element):
-        self.root = root
+    def __init__(self, root: Optional[ET.Element] = None):
         # Map '0XY' -> {
         #   "section": {"code": "0", "text": "Medical and Surgical"},
         #   "body_system": {"code": "F", "text": "Hepatobiliary System and Pancreas"},
         #   "operation": {"code": "T", "text": "Resection", "definition": "..."},
         #   "rows": [
-        #       {"4":[{"code":"4","text":"Gallbladder"},...],
-        #        "5":[{"code":"0","text":"Open"},...],
-        #        "6":[{"code":"Z","text":"No Device"},...],
-        #        "7":[{"code":"Z","text":"No Qualifier"},...]}
+        #       # one tuple per pcsRow: label options of axis 4..7 (Body Part, Approach, Device, Qualifier)
+        #       ((("4","Gallbladder","gallbladder"),...),
+        #        (("0","Open","open"),...),
+        #        (("Z","No Device","no device"),...),
+        #        (("Z","No Qualifier","no qualifier"),...))
         #   ]
         # }
         self.tables: Dict[str, Dict[str, Any]] = {}
-        self._parse()
+        # Header indexes for find_roots, keyed by section code + stripped/lowercased texts
+        self._by_header: Dict[Tuple[str, str, str], List[str]] = {}
+        self._by_body_system: Dict[Tuple[str, str], List[str]] = {}
+        self._by_operation: Dict[Tuple[str, str], List[str]] = {}
+        if root is not None:
+            for pt in root.findall('pcsTable'):
+                self._add_table(pt)
+            self._index_headers()
 
     @classmethod
-    def from_path(cls, path: str) -> "PCSTables":
-        tree = ET.parse(path)
-        return cls(tree.getroot())
+    def from_path(cls, path: str, workers: Optional[int] = None) -> "PCSTables":
+        """
+        Parse with `workers` processes; by default files under `_PARALLEL_MIN_BYTES`
+        (the shipped tables are ~3 MB) are streamed in this process.
+        """
+        if workers is None:
+            workers = 1 if os.path.getsize(path) < _PARALLEL_MIN_BYTES else (os.cpu_count() or 1)
+        if workers <= 1:
+            return cls.from_path_streaming(path)
+        return cls.from_path_parallel(path, workers)
 
-    def _labels(self, axis_elem: ET.Element) -> List[Dict[str, str]]:
-        out = []
-        for lab in axis_elem.findall('label'):
-            out.append({"code": lab.attrib.get('code', ''), "text": (lab.text or '').strip()})
-        return out
+    @classmethod
+    def from_path_parallel(cls, path: str, workers: int) -> "PCSTables":
+        """
+        Shard the file by top-level <pcsTable> (found with a byte scan over an mmap) into
+        `workers` runs and parse them in a process pool; parts are merged in file order,
+        so later duplicate keys still win. Assumes no '<pcsTable' inside comments/CDATA.
+        """
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            starts = [m.start() for m in _TABLE_START_RX.finditer(mm)]
+            if not starts:
+                return cls.from_path_streaming(path)
+            end = mm.rfind(_TABLE_END) + len(_TABLE_END)
+            step = -(-len(starts) // workers)
+            bounds = starts[::step] + [end]
+            chunks = [b"<pcsTables>" + mm[a:b] + b"</pcsTables>" for a, b in zip(bounds, bounds[1:])]
+        obj = cls()
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            for part in ex.map(_parse_table_chunk, chunks):
+                obj.tables.update(part)
+        obj._index_headers()
+        return obj
+
+    @classmethod
+    def from_path_streaming(cls, path: str) -> "PCSTables":
+        """
+        Build from the XML file with iterparse, discarding each <pcsTable> once consumed,
+        so the whole document is never held in memory next to `self.tables`.
+        """
+        obj = cls()
+        for pt in _iter_elements(path, 'pcsTable'):
+            obj._add_table(pt)
+        obj._index_headers()
+        return obj
+
+    # Children are walked directly and dispatched on tag (no findall/findtext path lookups)
+    @staticmethod
+    def _label(lab: ET.Element) -> Label:
+        code, text = lab.attrib.get('code', ''), (lab.text or '').strip()
+        key = (code, text)
+        label = _LABEL_INTERN.get(key)
+        if label is None:
+            label = _LABEL_INTERN[key] = (code, text, text.lower())
+        return label
+
+    def _labels(self, axis_elem: ET.Element) -> List[Label]:
+        return [self._label(c) for c in axis_elem if c.tag == 'label']
 
     def _axis_info(self, table_elem: ET.Element) -> Dict[str, Any]:
         info: Dict[str, Any] = {}
-        for ax in table_elem.findall('axis'):
-            pos = ax.attrib.get('pos')
-            labels = self._labels(ax)
-            title = (ax.findtext('title') or '').strip()
-            definition = (ax.findtext('definition') or '').strip()
-            info[pos] = {"title": title, "definition": definition, "labels": labels}
+        for ax in table_elem:
+            if ax.tag != 'axis':
+                continue
+            labels: List[Label] = []
+            title = definition = None  # first <title>/<definition> child, as findtext
+            for c in ax:
+                tag = c.tag
+                if tag == 'label':
+                    labels.append(self._label(c))
+                elif tag == 'title':
+                    if title is None:
+                        title = (c.text or '').strip()
+                elif tag == 'definition':
+                    if definition is None:
+                        definition = (c.text or '').strip()
+            info[ax.attrib.get('pos')] = {"title": title or '', "definition": definition or '', "labels": labels}
         return info
 
-    def _parse(self):
-        for pt in self.root.findall('pcsTable'):
-            header = self._axis_info(pt)
-            # Expect single label for axis 1..3
-            ax1 = header.get('1', {}); lab1 = (ax1.get('labels') or [{}])[0]
-            ax2 = header.get('2', {}); lab2 = (ax2.get('labels') or [{}])[0]
-            ax3 = header.get('3', {}); lab3 = (ax3.get('labels') or [{}])[0]
-            sec = lab1.get('code','')
-            bs = lab2.get('code','')
-            op = lab3.get('code','')
-            key = f"{sec}{bs}{op}" if sec and bs and op else None
-            if not key:
+    def _add_table(self, pt: ET.Element):
+        header = self._axis_info(pt)
+        # Expect single label for axis 1..3
+        ax1 = header.get('1', {}); lab1 = (ax1.get('labels') or [('', '', '')])[0]
+        ax2 = header.get('2', {}); lab2 = (ax2.get('labels') or [('', '', '')])[0]
+        ax3 = header.get('3', {}); lab3 = (ax3.get('labels') or [('', '', '')])[0]
+        sec = lab1[0]
+        bs = lab2[0]
+        op = lab3[0]
+        key = f"{sec}{bs}{op}" if sec and bs and op else None
+        if not key:
+            return
+        table_entry = {
+            "section": {"code": sec, "text": lab1[1]},
+            "body_system": {"code": bs, "text": lab2[1]},
+            "operation": {"code": op, "text": lab3[1], "definition": header.get('3',{}).get('definition','')},
+            "rows": []
+        }
+        # Rows (axis 4..7)
+        for row in pt:
+            if row.tag != 'pcsRow':
                 continue
-            table_entry = {
-                "section": {"code": sec, "text": lab1.get('text','')},
-                "body_system": {"code": bs, "text": lab2.get('text','')},
-                "operation": {"code": op, "text": lab3.get('text',''), "definition": header.get('3',{}).get('definition','')},
-                "rows": []
-            }
-            # Rows (axis 4..7)
-            for row in pt.findall('pcsRow'):
-                row_dict = {}
-                for ax in row.findall('axis'):
-                    pos = ax.attrib.get('pos')
-                    row_dict[pos] = self._labels(ax)
-                # Only keep if at least body part axis present
-                if row_dict:
-                    table_entry["rows"].append(row_dict)
-            self.tables[key] = table_entry
+            axes: List[Tuple[Label, ...]] = [(), (), (), ()]
+            found = False
+            for ax in row:
+                if ax.tag != 'axis':
+                    continue
+                i = _ROW_AXES.get(ax.attrib.get('pos'))
+                found = True
+                if i is not None:
+                    axes[i] = tuple(self._labels(ax))
+            # Only keep if at least body part axis present
+            if found:
+                table_entry["rows"].append(tuple(axes))
+        self.tables[key] = table_entry
+
+    def _index_headers(self):
+        """(Re)build the header indexes; keys are listed in table order, as a scan would return them."""
+        self._by_header, self._by_body_system, self._by_operation = {}, {}, {}
+        for k, t in self.tables.items():
+            sec = t["section"]["code"]
+            bs_lc = _norm(t["body_system"]["text"]).lower()
+            op_lc = _norm(t["operation"]["text"]).lower()
+            self._by_header.setdefault((sec, bs_lc, op_lc), []).append(k)
+            self._by_body_system.setdefault((sec, bs_lc), []).append(k)
+            self._by_operation.setdefault((sec, op_lc), []).append(k)
 
     # Lookup helpers
     def find_roots(self, section_code: str, body_system_name: Optional[str], operation_name: Optional[str]) -> List[str]:
-        roots = []
-        for k, t in self.tables.items():
-            if t["section"]["code"] != section_code:
-                continue
-            bs_ok = True
-            op_ok = True
-            if body_system_name:
-                bs_ok = _eq(t["body_system"]["text"], body_system_name)
-            if operation_name:
-                op_ok = _eq(t["operation"]["text"], operation_name)
-            if bs_ok and op_ok:
-                roots.append(k)
-        return roots
+        bs_lc = _norm(body_system_name).lower() if body_system_name else None
+        op_lc = _norm(operation_name).lower() if operation_name else None
+        if bs_lc is not None and op_lc is not None:
+            return list(self._by_header.get((section_code, bs_lc, op_lc), []))
+        if bs_lc is not None:
+            return list(self._by_body_system.get((section_code, bs_lc), []))
+        if op_lc is not None:
+            return list(self._by_operation.get((section_code, op_lc), []))
+        # Neither given: every table of the section
+        return [k for k, t in self.tables.items() if t["section"]["code"] == section_code]
 
     def best_match_row(self, root_key: str,
                        body_part_name: Optional[str],
@@ -114,73 +321,76 @@ class PCSTables:
         picked label objects for axis 4..7 and alternates contains other viable
         combinations with scores.
         """
+        return self.best_match_row_multi(root_key, [_match_key(body_part_name)], _match_key(approach_name),
+                                         [_match_key(device_name)], _match_key(qualifier_name))
+
+    def best_match_row_multi(self, root_key: str,
+                             bp_lcs: List[Optional[str]],
+                             ap_lc: Optional[str],
+                             dv_lcs: List[Optional[str]],
+                             q_lc: Optional[str],
+                             alternates: bool = True) -> Tuple[Optional[str], Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        `best_match_row` for several wanted body parts and devices at once. Names are already
+        stripped+lowercased ([None] when not given). Each row is scored once per name instead of
+        once per (body part, device) pair. Returns the result for the first pair (body part major)
+        whose best row yields a code, i.e. what trying the pairs one by one keeps; alternates list
+        each row with its best pair. With `alternates=False` none are built and the scan stops
+        as soon as the first pair has a complete row at the highest score it could reach.
+        """
         t = self.tables.get(root_key)
         if not t:
             return None, {}, []
-        best = None
-        best_score = -1
-        best_choice = None
+        nd = len(dv_lcs)
+        best_score = [-1] * (len(bp_lcs) * nd)
+        best: List[Optional[Tuple[Optional[Label], ...]]] = [None] * len(best_score)
 
         alts: List[Dict[str, Any]] = []
-
-        for row in t["rows"]:
-            # axis positions 4..7 may each have several label options
-            bparts = row.get('4', [])
-            apprs = row.get('5', [])
-            devs  = row.get('6', [])
-            quals = row.get('7', [])
-
-            # Scoring: prefer exact text match; fallback to any when None
-            def pick(options, want_name: Optional[str]) -> Tuple[Optional[Dict[str,str]], int]:
-                if not options:
-                    return None, 0
-                if not want_name:
-                    # Default preference: if there is 'No Device' or 'No Qualifier', prefer that by convention
-                    if any(_eq(o.get('text',''), 'No Device') for o in options):
-                        for o in options:
-                            if _eq(o.get('text',''), 'No Device'):
-                                return o, 1
-                    if any(_eq(o.get('text',''), 'No Qualifier') for o in options):
-                        for o in options:
-                            if _eq(o.get('text',''), 'No Qualifier'):
-                                return o, 1
-                    return options[0], 0
-                # exact match
-                for o in options:
-                    if _eq(o.get('text',''), want_name):
-                        return o, 3
-                # substring match
-                for o in options:
-                    if _contains(o.get('text',''), want_name) or _contains(want_name, o.get('text','')):
-                        return o, 2
-                return options[0], 0
-
-            pick4, s4 = pick(bparts, body_part_name)
-            pick5, s5 = pick(apprs, approach_name)
-            pick6, s6 = pick(devs, device_name)
-            pick7, s7 = pick(quals, qualifier_name)
-            score = s4 + s5 + s6 + s7
-            choice = {"4": pick4, "5": pick5, "6": pick6, "7": pick7}
-            if score > best_score:
-                best_score = score
-                best = (pick4, pick5, pick6, pick7)
-                best_choice = choice
-
+        prefix = f"{t['section']['code']}{t['body_system']['code']}{t['operation']['code']}"
+        # Upper bound of a row score for the first pair: 3 per wanted name (a whitespace-only name
+        # gives key "", which substring-matches every option), 1 for a default pick
+        max_first = sum(3 if want is not None else 1 for want in (bp_lcs[0], ap_lc, dv_lcs[0], q_lc))
+
+        for bparts, apprs, devs, quals in t["rows"]:
+            picks4 = [_pick_option(bparts, bp) for bp in bp_lcs]
+            pick5, s5 = _pick_option(apprs, ap_lc)
+            picks6 = [_pick_option(devs, dv) for dv in dv_lcs]
+            pick7, s7 = _pick_option(quals, q_lc)
+            row_score = -1
+            row_pick = None
+            for i, (pick4, s4) in enumerate(picks4):
+                for j, (pick6, s6) in enumerate(picks6):
+                    score = s4 + s5 + s6 + s7
+                    if score > best_score[i * nd + j]:
+                        best_score[i * nd + j] = score
+                        best[i * nd + j] = (pick4, pick5, pick6, pick7)
+                    if score > row_score:
+                        row_score = score
+                        row_pick = (pick4, pick6)
+
+            if not alternates:
+                # Nothing can replace the first pair's row now, and it wins if complete
+                if best_score[0] == max_first and all(best[0]):
+                    break
+                continue
             # Record alt
+            pick4, pick6 = row_pick
             code = None
             if pick4 and pick5 and pick6 and pick7:
-                code = f"{t['section']['code']}{t['body_system']['code']}{t['operation']['code']}{pick4['code']}{pick5['code']}{pick6['code']}{pick7['code']}"
+                code = f"{prefix}{pick4[0]}{pick5[0]}{pick6[0]}{pick7[0]}"
             alts.append({
                 "code": code,
-                "score": score,
-                "labels": choice
+                "score": row_score,
+                "labels": {"4": _label_dict(pick4), "5": _label_dict(pick5),
+                           "6": _label_dict(pick6), "7": _label_dict(pick7)}
             })
 
-        if best and best_choice:
-            b4, b5, b6, b7 = best
-            if b4 and b5 and b6 and b7:
-                code = f"{t['section']['code']}{t['body_system']['code']}{t['operation']['code']}{b4['code']}{b5['code']}{b6['code']}{b7['code']}"
-                return code, {"4": b4, "5": b5, "6": b6, "7": b7}, alts
+        for picks in best:
+            if picks and all(picks):
+                b4, b5, b6, b7 = picks
+                code = f"{prefix}{b4[0]}{b5[0]}{b6[0]}{b7[0]}"
+                return code, {"4": _label_dict(b4), "5": _label_dict(b5),
+                              "6": _label_dict(b6), "7": _label_dict(b7)}, alts
         return None, {}, alts
 
 # ---------- Index Parser (lightweight leads) ----------
@@ -189,33 +399,75 @@ class PCSIndex:
     """
     Parses icd10pcs_index_2025.xml to provide term → code leads like '0FT4'.
     """
-    def __init__(self, root: ET.Element):
-        self.root = root
+    def __init__(self, root: Optional[ET.Element] = None):
+        # (lowercased mainTerm title, its codes) in document order; terms without codes are dropped
+        self.terms: List[Tuple[str, List[str]]] = []
+        if root is not None:
+            for mt in root.iterfind('.//mainTerm'):
+                self._add_term(mt)
+        self._build_automaton()
+
+    def _add_term(self, mt: ET.Element):
+        title = (mt.findtext('title') or '').strip()
+        if not title:
+            return
+        codes = [c for c in ((e.text or '').strip() for e in mt.iterfind('.//codes')) if c]
+        if codes:
+            self.terms.append((title.lower(), codes))
+
+    def __getstate__(self):
+        # The automaton is rebuilt on unpickle (cheap next to parsing the XML)
+        return {"terms": self.terms}
+
+    def __setstate__(self, state):
+        self.terms = state["terms"]
+        self._build_automaton()
+
+    def _build_automaton(self):
+        self._automaton = None
+        if ahocorasick is not None:
+            ordinals: Dict[str, List[int]] = {}
+            for i, (title_lc, _) in enumerate(self.terms):
+                ordinals.setdefault(title_lc, []).append(i)
+            self._automaton = ahocorasick.Automaton()
+            for title_lc, ids in ordinals.items():
+                self._automaton.add_word(title_lc, ids)
+            self._automaton.make_automaton()
 
     @classmethod
     def from_path(cls, path: str) -> "PCSIndex":
-        tree = ET.parse(path)
-        return cls(tree.getroot())
+        """Stream the index file, keeping only the mainTerm titles and codes."""
+        obj = cls()
+        for mt in _iter_elements(path, 'mainTerm'):
+            obj._add_term(mt)
+        obj._build_automaton()
+        return obj
+
+    def _matching_terms(self, t: str) -> List[int]:
+        """Ordinals of terms whose title occurs in t (substring match), ascending."""
+        if self._automaton is None:
+            return [i for i, (title_lc, _) in enumerate(self.terms) if title_lc in t]
+        hit = set()
+        for _, ids in self._automaton.iter(t):
+            hit.update(ids)
+        return sorted(hit)
 
     def find_leads_in_text(self, text: str, limit: int = 10) -> List[str]:
         """
-        Naive scan of mainTerm titles and their 'see' entries; collects codes text (usually 3-4 chars like 0FT4).
+        Scan of mainTerm titles and their 'see' entries; collects codes text (usually 3-4 chars like 0FT4).
+        Leads come in index order, as a walk over the terms would find them.
         """
         t = (text or "").lower()
-        leads: List[str] = []
-        for mt in self.root.iterfind('.//mainTerm'):
-            title = (mt.findtext('title') or '').strip()
-            if not title:
-                continue
-            if title.lower() in t:
-                # collect codes from children 'codes'
-                for codes in mt.iterfind('.//codes'):
-                    c = (codes.text or '').strip()
-                    if c and c not in leads:
-                        leads.append(c)
-                        if len(leads) >= limit:
-                            return leads
-        return leads
+        leads: Dict[str, None] = {}  # insertion-ordered set
+        if not t:
+            return []
+        for i in self._matching_terms(t):
+            for c in self.terms[i][1]:
+                if c not in leads:
+                    leads[c] = None
+                    if len(leads) >= limit:
+                        return list(leads)
+        return list(leads)
 
 # ---------- Public Context + Resolver ----------
 
@@ -223,9 +475,7 @@ class PCSIndex:
 
 def _load_json_if_exists(path: str):
     if os.path.exists(path):
-        import json
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return read_json(path)
     return None
 
 class BodyPartKey:
@@ -258,18 +508,21 @@ class DeviceKey:
 class DeviceAggregation:
     def __init__(self, data: dict):
         # expects {"records": [{"specific_device": "...", "general_device": "...", ...}, ...]}
-        self.to_general = {}
+        self.to_general: Dict[str, Tuple[str, ...]] = {}
+        gens: Dict[str, Dict[str, None]] = {}  # ordered sets: first record wins
         recs = (data or {}).get("records") or []
         for r in recs:
             spec = (r.get("specific_device") or "").strip()
             gen = (r.get("general_device") or "").strip()
             if spec and gen:
-                self.to_general.setdefault(spec, set()).add(gen)
+                gens.setdefault(spec, {})[gen] = None
+        # Read-only after load: hand out the tuples themselves
+        self.to_general = {spec: tuple(g) for spec, g in gens.items()}
 
-    def generalize(self, name: Optional[str]) -> List[str]:
+    def generalize(self, name: Optional[str]) -> Tuple[str, ...]:
         if not name:
-            return []
-        return list(self.to_general.get(name, []))
+            return ()
+        return self.to_general.get(name, ())
 
 # ---------- Extend TablesContext to load keys ----------
 
@@ -288,9 +541,9 @@ class TablesContext:
         tables_path = os.path.join(self.assets_dir, "icd10pcs_tables_2025.xml")
         index_path = os.path.join(self.assets_dir, "icd10pcs_index_2025.xml")
         if os.path.exists(tables_path):
-            self.tables = PCSTables.from_path(tables_path)
+            self.tables = _load_cached(tables_path, PCSTables.from_path)
         if os.path.exists(index_path):
-            self.index = PCSIndex.from_path(index_path)
+            self.index = _load_cached(index_path, PCSIndex.from_path)
         # Keys
         bp_json = _load_json_if_exists(os.path.join(self.assets_dir, "body_part_key.json"))
         if bp_json: self.body_key = BodyPartKey(bp_json)
@@ -299,6 +552,11 @@ class TablesContext:
         agg_json = _load_json_if_exists(os.path.join(self.assets_dir, "device_aggregation.json"))
         if agg_json: self.device_agg = DeviceAggregation(agg_json)
         self.loaded = self.tables is not None
+        # Resolver results and normalized names depend only on the inputs and what was loaded above;
+        # a reload starts fresh caches
+        self._resolve_cached = functools.lru_cache(maxsize=4096)(functools.partial(_resolve_candidates, self))
+        self._body_part_names = functools.lru_cache(maxsize=2048)(functools.partial(_body_part_names, self))
+        self._device_names = functools.lru_cache(maxsize=2048)(functools.partial(_device_names, self))
 
     def is_ready(self) -> bool:
         return self.loaded
@@ -306,34 +564,43 @@ class TablesContext:
 # ---------- Normalization helpers ----------
 
 def _norm_body_part(context: TablesContext, name: Optional[str]) -> List[str]:
-    """Return a list of preferred names for matching axis-4 labels."""
+    """Return a list of preferred names for matching axis-4 labels (memoized per context)."""
     if not name:
         return []
-    # use body part key; else return the given name
-    if context and context.body_key:
-        return context.body_key.lookup(name) or [name]
-    return [name]
+    if not context:
+        return [name]
+    return list(context._body_part_names(name))
 
 def _norm_device(context: TablesContext, name: Optional[str]) -> List[str]:
-    """Return a list of candidate device names (specific + generalized)."""
+    """Return a list of candidate device names (specific + generalized; memoized per context)."""
     if not name:
         return []
+    if not context:
+        return [name]
+    return list(context._device_names(name))
+
+def _body_part_names(context: TablesContext, name: str) -> Tuple[str, ...]:
+    # use body part key; else return the given name
+    if context.body_key:
+        return tuple(context.body_key.lookup(name) or [name])
+    return (name,)
+
+def _device_names(context: TablesContext, name: str) -> Tuple[str, ...]:
     candidates = [name]
-    if context and context.device_key:
+    if context.device_key:
         candidates = context.device_key.lookup(name) or [name]
     # generalize
     more = []
-    if context and context.device_agg:
+    if context.device_agg:
         for c in list(candidates):
             more += context.device_agg.generalize(c)
-    # de-dup
-    out = []
-    for v in candidates + more:
-        if v and v not in out:
-            out.append(v)
-    return out
+    # de-dup, first occurrence wins
+    return tuple(v for v in dict.fromkeys(candidates + more) if v)
+
 
 
+def _copy_candidate(c: Dict[str, Any]) -> Dict[str, Any]:
+    return {**c, "components": dict(c["components"]), "labels": dict(c["labels"])}
 
 def resolve_code(context: TablesContext,
                  section_name: str,
@@ -351,10 +618,21 @@ def resolve_code(context: TablesContext,
       2) If none, try index leads from note_text (first 3 chars define root).
       3) For each candidate root, pick best row by matching body part/approach/device/qualifier names.
       4) Rank by score; return top + alternates.
+    Row matching (3-4) is memoized per context on the roots and names; callers get their own copies.
     """
     if not context or not context.tables:
         return {"ok": False, "error": "Tables not loaded.", "candidates": []}
-
+    roots = _candidate_roots(context, body_system_name, root_operation_name, note_text)
+    # The note only matters through the roots found above, so the cache never holds note text
+    candidates = context._resolve_cached(tuple(roots), body_part_name, approach_name,
+                                         device_name, qualifier_name)
+    return {"ok": True, "error": None, "candidates": [_copy_candidate(c) for c in candidates]}
+
+def _candidate_roots(context: TablesContext,
+                     body_system_name: Optional[str],
+                     root_operation_name: Optional[str],
+                     note_text: Optional[str]) -> List[str]:
+    """Steps 1-2 of `resolve_code`: table keys to match rows in."""
     # 1) Exact header match
     roots = context.tables.find_roots(section_code="0",
                                       body_system_name=body_system_name,
@@ -369,33 +647,24 @@ def resolve_code(context: TablesContext,
             rt = lead[:3]
             if rt.startswith('0') and rt not in roots and rt in context.tables.tables:
                 roots.append(rt)
-
+    return roots
+
+def _resolve_candidates(context: TablesContext,
+                        roots: Tuple[str, ...],
+                        body_part_name: Optional[str],
+                        approach_name: Optional[str],
+                        device_name: Optional[str],
+                        qualifier_name: Optional[str]) -> Tuple[Dict[str, Any], ...]:
+    """Uncached steps 3-4 of `resolve_code`: the top candidates, best first."""
     candidates: List[Dict[str, Any]] = []
+    bp_lcs = [_match_key(bp) for bp in (_norm_body_part(context, body_part_name) or [None])]
+    dv_lcs = [_match_key(dv) for dv in (_norm_device(context, device_name) or [None])]
+    ap_lc = _match_key(approach_name)
+    q_lc = _match_key(qualifier_name)
     for rt in roots:
-        bp_list = _norm_body_part(context, body_part_name)
-        dev_list = _norm_device(context, device_name)
-        # Try each combination of normalized names; keep best
-        trial_best = None
-        trial_best_choice = None
-        trial_best_alts = None
-        trial_best_score = -1
-        for bp in (bp_list or [None]):
-            for dv in (dev_list or [None]):
-                code, chosen, alts = context.tables.best_match_row(
-                    root_key=rt,
-                    body_part_name=bp,
-                    approach_name=approach_name,
-                    device_name=dv,
-                    qualifier_name=qualifier_name
-                )
-                if code:
-                    score = sum(1 for k,v in chosen.items() if v)
-                    if score > trial_best_score:
-                        trial_best_score = score
-                        trial_best = code
-                        trial_best_choice = chosen
-                        trial_best_alts = alts
-        code, chosen, alts = trial_best, trial_best_choice, (trial_best_alts or [])
+        # Every combination of normalized names in one pass over the rows
+        code, chosen, _ = context.tables.best_match_row_multi(rt, bp_lcs, ap_lc, dv_lcs, q_lc,
+                                                              alternates=False)
         if code:
             t = context.tables.tables[rt]
             candidates.append({
@@ -424,4 +693,4 @@ def resolve_code(context: TablesContext,
     # Rank by score desc (tie-breaker by code)
     candidates.sort(key=lambda x: (x["score"], x["pcs_code"]), reverse=True)
 
-    return {"ok": True, "error": None, "candidates": candidates[:5]}
+    return tuple(candidates[:5])